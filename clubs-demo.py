@@ -3,20 +3,95 @@
 
 from __future__ import annotations
 
+import errno
+import fcntl
+import functools
+import io
+import itertools
 import os
-import uuid
+import re
 import time
 import locale
 import threading
-import selectors
+import select
+import signal
 import subprocess
 import shlex
 import sys
 import textwrap
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Optional, Tuple
+from typing import Optional, TextIO, Tuple
 
 BOX_PREFIX = "│ "
+_BOX_RE = re.compile(r"(?m)^")
+# Lines textwrap.dedent blanks because they hold only spaces and tabs
+_WHITESPACE_LINE_RE = re.compile(r"(?m)^[ \t]+$")
+# Every line boundary str.splitlines() recognizes, so CRLF or a lone CR still
+# starts a new boxed line.
+_LINE_BREAK_RE = re.compile("\r\n|[\r\x0b\x0c\x1c\x1d\x1e\x85\u2028\u2029]")
+
+
+def _inheritable_fds() -> list[int]:
+    """Return the open descriptors of this process that survive an exec."""
+
+    fds = []
+    for name in os.listdir("/dev/fd"):
+        try:
+            if os.get_inheritable(int(name)):
+                fds.append(int(name))
+        except OSError:
+            # The descriptor os.listdir used to read the directory is gone
+            pass
+    return fds
+
+
+class _ShellProcess:
+    """Minimal stand-in for :class:`subprocess.Popen` around a spawned PID."""
+
+    def __init__(self, pid: int, args: list[str], stdout):
+        self.pid = pid
+        self.args = args
+        self.stdout = stdout
+        self.returncode: Optional[int] = None
+
+    def _reap(self, flags: int) -> Optional[int]:
+        if self.returncode is None:
+            try:
+                pid, status = os.waitpid(self.pid, flags)
+            except ChildProcessError:
+                # Already reaped elsewhere (or SIGCHLD is ignored); the exit
+                # status is lost, so report 0 as Popen does.
+                pid, status = self.pid, 0
+            if pid:
+                self.returncode = os.waitstatus_to_exitcode(status)
+        return self.returncode
+
+    def poll(self) -> Optional[int]:
+        return self._reap(os.WNOHANG)
+
+    def wait(self, timeout: Optional[float] = None) -> int:
+        if timeout is None:
+            return self._reap(0)
+        end_time = time.monotonic() + timeout
+        delay = 0.0005
+        while self.poll() is None:
+            remaining = end_time - time.monotonic()
+            if remaining <= 0:
+                raise subprocess.TimeoutExpired(self.args, timeout)
+            time.sleep(min(delay, remaining))
+            delay = min(delay * 2, 0.05)
+        return self.returncode
+
+    def send_signal(self, sig: int):
+        if self.poll() is None:
+            os.kill(self.pid, sig)
+
+    def terminate(self):
+        self.send_signal(signal.SIGTERM)
+
+    def kill(self):
+        self.send_signal(signal.SIGKILL)
 
 
 class PersistentShell:
@@ -27,7 +102,11 @@ class PersistentShell:
 
     _CTRL_FD = 9
     _DEBUG_FD = 5
+    _PIPE_SIZE = 1 << 20
     _RS = b"\x1e"  # ASCII Record Separator to minimize collision in user output
+    _PREFIX_HEAD = _RS + b"PSHEXIT:"
+    _SUFFIX = _RS + b"\n"
+    _SENTINEL_RE = re.compile(re.escape(_PREFIX_HEAD) + rb"([0-9a-f]+):(-?\d+)" + re.escape(_SUFFIX))
 
     def __init__(
         self,
@@ -35,7 +114,7 @@ class PersistentShell:
         env: Optional[dict] = None,
         *,
         shell_path: str | None = None,
-        login: bool = True,
+        login: bool = False,
         encoding: Optional[str] = None,
         read_chunk: int = 65536,
         debug: bool = False
@@ -47,10 +126,22 @@ class PersistentShell:
         self._encoding = encoding or locale.getpreferredencoding(False)
         self._read_chunk = int(read_chunk)
         self._lock = threading.RLock()
-        self._residual = bytearray()
+        # Tokens only have to be unique within this shell, and _lock
+        # serializes commands, so a counter is enough.
+        self._tokens = itertools.count(1)
+
+        # The bootstrap changes into cwd itself; check it up front so a bad
+        # directory fails here, as it did with Popen, not on the first read.
+        if cwd and not os.path.isdir(cwd):
+            raise FileNotFoundError(errno.ENOENT, "No such directory", cwd)
 
         # Create a dedicated pipe for control input (FD 9 on the child side)
         ctrl_r, ctrl_w = os.pipe()
+        if ctrl_r == self._CTRL_FD:
+            # A dup2 onto itself would leave the descriptor close-on-exec
+            moved = fcntl.fcntl(ctrl_r, fcntl.F_DUPFD_CLOEXEC, self._CTRL_FD + 1)
+            os.close(ctrl_r)
+            ctrl_r = moved
         self._ctrl_r = ctrl_r
         self._ctrl_w = ctrl_w
 
@@ -62,10 +153,12 @@ class PersistentShell:
             or "zsh"
         )
 
-        # Build the bootstrap script
+        # Build the bootstrap script; posix_spawn has no working directory
+        # option, so the shell changes into *cwd* itself.
         debug_fd = self._DEBUG_FD
+        chdir = f"builtin cd -- {shlex.quote(cwd)} || exit 96" if cwd else ""
         bootstrap = f"""\
-# PersistentShell bootstrap (executed via: $SHELL -lc '<this script>')
+# PersistentShell bootstrap (executed via: $SHELL [-l] -c '<this script>')
 # stdin is already /dev/null from the parent; do not touch FD 0 here.
 
 # ── Debug channel on FD {debug_fd} (default: silent) ───────────────────────────
@@ -77,9 +170,8 @@ else
   exec {debug_fd}>/dev/null
 fi
 
-# ── Control FD: duplicate the inherited FD to 9 and close the original ─────────
-exec 9<&{ctrl_r} || {{ echo "PSH: dup {ctrl_r} -> 9 failed" >&200; exit 97; }}
-exec {ctrl_r}<&- || true
+# Control FD 9 and the merged output on FDs 1/2 are set up by the parent.
+{chdir}
 
 # Sanitize prompts/hooks; keep normal shell semantics (no `set -e`)
 PS1=; PS2=; PROMPT_COMMAND=
@@ -126,43 +218,79 @@ exit 0
             argv.append("-l")
         argv += ["-c", bootstrap]
 
-        # Set up environment with debug options if requested
-        shell_env = env.copy() if env else os.environ.copy()
+        # Set up environment with debug options if requested. Only copy it
+        # when it needs extending; None lets the child inherit ours directly.
+        shell_env = env
         if debug:
-            shell_env["PSH_DEBUG"] = "1"
-
-        # Start Bash
-        self._proc = subprocess.Popen(
-            argv,
-            stdin=subprocess.DEVNULL,  # Important: don't use stdin for bootstrap
-            stdout=subprocess.PIPE,
-            stderr=subprocess.STDOUT,
-            cwd=cwd,
-            env=shell_env,
-            bufsize=0,
-            close_fds=True,
-            pass_fds=(self._ctrl_r,),
-            text=False
-        )
-
-        # Prepare a selector to read from the combined output pipe efficiently
-        self._sel = selectors.DefaultSelector()
-        if self._proc.stdout is None:
-            raise RuntimeError("Failed to create pipes for persistent shell.")
-        self._sel.register(self._proc.stdout, selectors.EVENT_READ)
-
-        # Don't write bootstrap to stdin - it's handled by -c argument
-        self._ctrl_wf = os.fdopen(self._ctrl_w, "wb", buffering=0)
+            shell_env = dict(env if env is not None else os.environ, PSH_DEBUG="1")
+
+        # Start the shell with posix_spawn, which (unlike Popen with pass_fds)
+        # avoids a full fork. Descriptors Python opens are close-on-exec, but
+        # ones inherited from our own parent may not be; close those in the
+        # child as close_fds=True would, leaving only FDs 0, 1, 2 and 9.
+        out_r, out_w = os.pipe()
+        file_actions = [
+            (os.POSIX_SPAWN_CLOSE, fd) for fd in _inheritable_fds()
+            if fd not in (0, 1, 2, self._CTRL_FD)
+        ]
+        file_actions += [
+            (os.POSIX_SPAWN_OPEN, 0, os.devnull, os.O_RDONLY, 0),  # don't use stdin for bootstrap
+            (os.POSIX_SPAWN_DUP2, out_w, 1),
+            (os.POSIX_SPAWN_DUP2, out_w, 2),
+            (os.POSIX_SPAWN_DUP2, self._ctrl_r, self._CTRL_FD),
+        ]
+        try:
+            pid = os.posix_spawnp(
+                self._shell_path,
+                argv,
+                os.environ if shell_env is None else shell_env,
+                file_actions=file_actions,
+                # Python ignores these; restore them as Popen would
+                setsigdef=(signal.SIGPIPE, signal.SIGXFSZ),
+            )
+        except BaseException:
+            for fd in (out_r, self._ctrl_r, self._ctrl_w):
+                os.close(fd)
+            raise
+        finally:
+            os.close(out_w)
+        self._proc = _ShellProcess(pid, argv, open(out_r, "rb", buffering=0))
+
+        # Output is read straight from the pipe's file descriptor
+        self._out_fd = out_r
+
+        # Grow the output pipe (Linux only) so bursts of output drain in one
+        # read; unprivileged users may be capped below the requested size.
+        try:
+            pipe_size = fcntl.fcntl(self._out_fd, fcntl.F_SETPIPE_SZ, self._PIPE_SIZE)
+        except (AttributeError, OSError):
+            pass
+        else:
+            self._read_chunk = max(self._read_chunk, pipe_size)
+
+        # One receive buffer is reused for every command and only grows by
+        # doubling. It starts at one full read so the first read needn't grow
+        # it. Output read past a sentinel stays where it is for the next
+        # command: _recv_start and _recv_len bound the unconsumed bytes.
+        self._recv_buf = bytearray(self._read_chunk)
+        self._recv_start = 0
+        self._recv_len = 0
 
     def _assert_alive(self):
         if self._proc.poll() is not None:
             raise RuntimeError(f"Persistent shell has exited with code {self._proc.returncode}.")
 
     def _write_frame(self, token: str, command: str):
+        # Gather the frame straight from its parts; tokens are ASCII hex.
+        parts = [token.encode("ascii"), b"\x00", command.encode("utf-8"), b"\x00"]
         try:
-            self._ctrl_wf.write(token.encode("utf-8") + b"\x00" +
-                                command.encode("utf-8") + b"\x00")
-            self._ctrl_wf.flush()
+            while parts:
+                written = os.writev(self._ctrl_w, parts)
+                # Drop what was written and retry the rest after a short write
+                while parts and written >= len(parts[0]):
+                    written -= len(parts.pop(0))
+                if written:
+                    parts[0] = parts[0][written:]
         except BrokenPipeError:
             raise RuntimeError("Persistent shell control channel closed.")
 
@@ -171,13 +299,13 @@ exit 0
         self._assert_alive()
 
         token_b = token.encode("utf-8")
-        prefix = self._RS + b"PSHEXIT:" + token_b + b":"
-        suffix = self._RS + b"\n"
+        # Exit statuses print as at most 11 characters ("-2147483648")
+        max_len = len(self._PREFIX_HEAD) + len(token_b) + 1 + 11 + len(self._SUFFIX)
 
-        buf = bytearray()
-        if self._residual:
-            buf += self._residual
-            self._residual = bytearray()
+        # Output left over from the previous command seeds the buffer.
+        buf = self._recv_buf
+        start = self._recv_start
+        size = self._recv_len
 
         end_time = (time.monotonic() + timeout) if timeout else None
 
@@ -186,60 +314,83 @@ exit 0
                 return None
             return max(0.0, end_time - time.monotonic())
 
+        # Bytes before search_from have already been ruled out as the start of
+        # the sentinel, so each read only rescans the tail of the buffer.
+        search_from = start
         while True:
-            # Check if sentinel is already in buffer
-            idx = buf.find(prefix)
-            if idx != -1:
-                after = buf[idx + len(prefix):]
-                j = after.find(suffix)
-                if j != -1:
-                    exit_bytes = after[:j]
-                    try:
-                        exit_code = int(exit_bytes.decode("ascii", "strict"))
-                    except Exception:
-                        raise RuntimeError("Malformed sentinel from persistent shell.")
-                    before = bytes(buf[:idx])
-                    remaining = bytes(after[j + len(suffix):])
-                    self._residual.extend(remaining)
-                    return before, exit_code
+            # Check if sentinel is already in buffer; one for another token is
+            # just part of the output.
+            match = self._SENTINEL_RE.search(buf, search_from, size)
+            while match is not None and match.group(1) != token_b:
+                match = self._SENTINEL_RE.search(buf, match.end(), size)
+            if match is not None:
+                exit_code = int(match.group(2))
+                idx, rest = match.span()
+                before = memoryview(buf)[start:idx].tobytes()
+                # Leave any residual in place; rewind once everything is consumed
+                if rest == size:
+                    rest = size = 0
+                self._recv_start = rest
+                self._recv_len = size
+                return before, exit_code
+            # A partial sentinel can only sit in the last max_len - 1 bytes
+            search_from = max(search_from, size - max_len + 1)
 
             # Need to read more
             self._assert_alive()
-            timeout_this = time_left()
-            events = self._sel.select(timeout_this)
-            if not events:
-                if end_time is not None and time.monotonic() >= end_time:
-                    raise TimeoutError("Timed out waiting for command to complete.")
+            if end_time is not None:
+                # Only a timed read has to wait for readiness; otherwise the
+                # blocking read below waits on the single pipe by itself.
+                ready, _, _ = select.select([self._out_fd], [], [], time_left())
+                if not ready:
+                    if time.monotonic() >= end_time:
+                        raise TimeoutError("Timed out waiting for command to complete.")
+                    continue
+
+            if size + self._read_chunk > len(buf):
+                if start:
+                    # Reclaim the space in front of unconsumed output first
+                    view = memoryview(buf)
+                    view[:size - start] = view[start:size]
+                    view.release()
+                    size -= start
+                    search_from -= start
+                    start = self._recv_start = 0
+                    self._recv_len = size
+                if size + self._read_chunk > len(buf):
+                    buf.extend(bytes(max(len(buf), self._read_chunk)))
+            try:
+                n = os.readv(self._out_fd, [memoryview(buf)[size:size + self._read_chunk]])
+            except (BlockingIOError, InterruptedError):
                 continue
+            if not n:
+                raise RuntimeError("Shell terminated unexpectedly while reading output.")
+            size += n
+            self._recv_len = size
 
-            for key, _ in events:
-                if self._proc.stdout:
-                    chunk = self._proc.stdout.read(self._read_chunk)
-                    if chunk is None:
-                        continue
-                    if chunk == b"":
-                        raise RuntimeError("Shell terminated unexpectedly while reading output.")
-                    buf.extend(chunk)
-
-    def run_command(self, command: str, *, timeout: Optional[float] = None) -> Tuple[str, int]:
-        """Execute a command in the persistent shell and return (combined_output, exit_code)."""
+    def run_command_bytes(self, command: str, *, timeout: Optional[float] = None) -> Tuple[bytes, int]:
+        """Execute a command in the persistent shell and return its raw (combined_output, exit_code)."""
         if "\x00" in command:
             raise ValueError("Command may not contain NUL characters.")
 
         with self._lock:
             self._assert_alive()
-            token = uuid.uuid4().hex
+            token = format(next(self._tokens), "x")
             self._write_frame(token, command)
-            out_bytes, exit_code = self._read_until_sentinel(token, timeout)
-            output = out_bytes.decode(self._encoding, errors="replace")
-            return output, exit_code
+            return self._read_until_sentinel(token, timeout)
+
+    def run_command(self, command: str, *, timeout: Optional[float] = None) -> Tuple[str, int]:
+        """Execute a command in the persistent shell and return (combined_output, exit_code)."""
+        out_bytes, exit_code = self.run_command_bytes(command, timeout=timeout)
+        return out_bytes.decode(self._encoding, errors="replace"), exit_code
 
     def close(self):
         """Cleanly shut down the shell process."""
         with self._lock:
             try:
-                if hasattr(self, "_ctrl_wf") and self._ctrl_wf:
-                    self._ctrl_wf.close()
+                if self._ctrl_w >= 0:
+                    os.close(self._ctrl_w)
+                    self._ctrl_w = -1
             except Exception:
                 pass
             try:
@@ -252,12 +403,8 @@ exit 0
                             self._proc.wait(timeout=2.0)
                         except subprocess.TimeoutExpired:
                             self._proc.kill()
+                            self._proc.wait()
             finally:
-                try:
-                    if self._proc.stdout:
-                        self._sel.unregister(self._proc.stdout)
-                except Exception:
-                    pass
                 try:
                     if self._proc.stdout:
                         self._proc.stdout.close()
@@ -275,6 +422,43 @@ exit 0
         self.close()
 
 
+@functools.lru_cache(maxsize=None)
+def normalize_command(command: str) -> str:
+    """Return ``textwrap.dedent(command).strip()``, skipping the margin scan for flush-left scripts."""
+
+    # The step scripts are written flush-left, so there is no common margin
+    # to remove; all dedent would still do is blank whitespace-only lines.
+    body = command.lstrip("\n")
+    if body[:1].isspace():
+        body = textwrap.dedent(body)
+    else:
+        body = _WHITESPACE_LINE_RE.sub("", body)
+    return body.strip()
+
+
+def box_output(output: str) -> str:
+    """Prefix every line of *output* with the box-drawing gutter."""
+
+    output = _LINE_BREAK_RE.sub("\n", output)
+    return _BOX_RE.sub(BOX_PREFIX, output.removesuffix("\n"))
+
+
+def write_markdown(text: str, out: TextIO | None = None) -> None:
+    """Write *text* to *out* (stdout by default), straight to its descriptor when it has one."""
+
+    out = out or sys.stdout
+    try:
+        fd = out.fileno()
+    except (AttributeError, OSError):
+        out.write(text)
+        return
+    # Anything already buffered must go out first to keep the order intact
+    out.flush()
+    data = memoryview(text.encode(out.encoding or "utf-8", out.errors or "strict"))
+    while data:
+        data = data[os.write(fd, data):]
+
+
 def run_step(
     shell: PersistentShell,
     title: str,
@@ -282,31 +466,46 @@ def run_step(
     commentary: str | None = None,
     *,
     stop_on_success: bool = False,
+    out: TextIO | None = None,
 ) -> list[str]:
-    """Execute commands using persistent shell and render the result in Markdown."""
+    """Execute commands using persistent shell and render the result in Markdown.
+
+    The Markdown is collected and written to *out*, which defaults to
+    stdout, in as few writes as possible: once at the end of the step, plus
+    once before each command when writing to stdout so progress stays
+    visible while the command runs.
+    """
 
     if isinstance(commands, str):
-        command_list = [textwrap.dedent(commands).strip()]
+        command_list = [normalize_command(commands)]
     else:
-        command_list = [textwrap.dedent(cmd).strip() for cmd in commands]
+        command_list = [normalize_command(cmd) for cmd in commands]
 
     outputs: list[str] = []
-    aggregated_lines: list[str] = []
+    aggregated: list[str] = []
     success = False
     last_error: subprocess.CalledProcessError | None = None
     failure_output: str = ""
+    log = io.StringIO()
 
-    print(f"## {title}\n")
+    def flush() -> None:
+        write_markdown(log.getvalue(), out)
+        log.seek(0)
+        log.truncate()
+
+    print(f"## {title}\n", file=log)
     if commentary:
-        print(f"{commentary}\n")
+        print(f"{commentary}\n", file=log)
 
-    print("```")
+    print("```", file=log)
     for index, command in enumerate(command_list):
         if not command:
             continue
 
         display_command = sanitize_command(command)
-        print(display_command)
+        print(display_command, file=log)
+        if out is None:
+            flush()
 
         try:
             output, exit_code = shell.run_command(command)
@@ -318,11 +517,11 @@ def run_step(
             last_error = error
             if not stop_on_success:
                 if output:
-                    print("")
-                    for line in output.splitlines():
-                        print(f"{BOX_PREFIX}{line}")
-                print("```")
-                print("")
+                    print("", file=log)
+                    print(box_output(output), file=log)
+                print("```", file=log)
+                print("", file=log)
+                flush()
                 raise SystemExit(error.returncode) from error
             failure_output = output
             continue
@@ -331,36 +530,37 @@ def run_step(
             last_error = subprocess.CalledProcessError(1, command, output=output)
             if not stop_on_success:
                 if output:
-                    print("")
-                    for line in output.splitlines():
-                        print(f"{BOX_PREFIX}{line}")
-                print("```")
-                print("")
+                    print("", file=log)
+                    print(box_output(output), file=log)
+                print("```", file=log)
+                print("", file=log)
+                flush()
                 raise SystemExit(1) from error
             failure_output = output
             continue
 
         outputs.append(output)
         if output:
-            aggregated_lines.extend(output.splitlines())
+            aggregated.append(box_output(output))
 
         if stop_on_success and success:
             break
 
     if stop_on_success and not success and last_error is not None:
         if failure_output:
-            print("")
-            for line in failure_output.splitlines():
-                print(f"{BOX_PREFIX}{line}")
-        print("```")
-        print("")
+            print("", file=log)
+            print(box_output(failure_output), file=log)
+        print("```", file=log)
+        print("", file=log)
+        flush()
         raise SystemExit(last_error.returncode) from last_error
 
-    if aggregated_lines:
-        print("")
-        print("\n".join(f"{BOX_PREFIX}{line}" for line in aggregated_lines))
-    print("```")
-    print("")
+    if aggregated:
+        print("", file=log)
+        print("\n".join(aggregated), file=log)
+    print("```", file=log)
+    print("", file=log)
+    flush()
 
     return outputs
 
@@ -374,6 +574,9 @@ def qp(path: Path) -> str:
 def rel(path: Path) -> str:
     """Return *path* relative to the script directory when possible."""
 
+    cached = REL_CACHE.get(path)
+    if cached is not None:
+        return cached
     try:
         return str(path.relative_to(SCRIPT_DIR))
     except ValueError:
@@ -381,10 +584,16 @@ def rel(path: Path) -> str:
 
 
 def sanitize_command(command: str) -> str:
-    display = command
-    for abs_path, rel_path in PATH_REPLACEMENTS:
-        display = display.replace(abs_path, rel_path)
-    return display
+    global _PATH_PATTERN
+
+    if _PATH_PATTERN is None:
+        # One alternation, longest first, so a path nested under another
+        # registered path is matched whole instead of by its parent prefix.
+        _PATH_PATTERN = re.compile("|".join(
+            re.escape(abs_path)
+            for abs_path in sorted(PATH_REPLACEMENTS, key=len, reverse=True)
+        ))
+    return _PATH_PATTERN.sub(lambda match: PATH_REPLACEMENTS[match.group(0)], command)
 
 
 def build_content_script(prefix: str, subject_text: str, title: str) -> str:
@@ -405,6 +614,10 @@ envelope format "${{{prefix}_WRAPPED}}"
 """
 
 
+def content_variables(prefix: str) -> list[str]:
+    return [f"{prefix}_SUBJECT", f"{prefix}_CLEAR", f"{prefix}_WRAPPED"]
+
+
 def build_digest_script(prefix: str, digest_var: str | None = None) -> str:
     digest = digest_var or f"{prefix}_DIGEST"
     return f"""
@@ -413,16 +626,93 @@ echo "${{{digest}}}"
 """
 
 
+def build_participant_script(name: str) -> str:
+    upper = name.upper()
+    return f"""
+{upper}_PRVKEYS=$(envelope generate prvkeys)
+{upper}_PUBKEYS=$(envelope generate pubkeys "${upper}_PRVKEYS")
+{upper}_XID=$(envelope xid new "${upper}_PRVKEYS")
+envelope format "${upper}_XID"
+"""
+
+
+def participant_variables(name: str) -> list[str]:
+    upper = name.upper()
+    return [f"{upper}_PRVKEYS", f"{upper}_PUBKEYS", f"{upper}_XID"]
+
+
+def transfer_failure(log: TextIO, output: str, exit_code: int) -> SystemExit:
+    """Render a failed shell-variable transfer to *log* the way ``run_step`` renders a failure."""
+
+    print("```", file=log)
+    if output:
+        print(box_output(output), file=log)
+    print("```", file=log)
+    print("", file=log)
+    return SystemExit(exit_code)
+
+
+Step = tuple[str, str, Optional[str], list[str]]
+
+
+def run_parallel_steps(shell: PersistentShell, branches: list[list[Step]]) -> None:
+    """Run independent branches of steps concurrently and replay their Markdown in order.
+
+    Each step is a ``(title, script, commentary, variables)`` tuple. The first
+    branch runs on *shell* itself while every other branch runs in sequence on
+    a worker shell of its own; once a worker branch finishes, the shell
+    *variables* its steps defined are copied into *shell* so later steps can
+    reference them.
+    """
+
+    def run_branch(steps: list[Step]) -> tuple[str, str, SystemExit | None]:
+        # Like the main shell, workers start from ENV without login startup;
+        # anything earlier steps exported is not passed on to them.
+        with PersistentShell(cwd=str(SCRIPT_DIR), env=ENV) as worker:
+            worker.run_command(SHELL_OPTIONS)
+            log = io.StringIO()
+            variables: list[str] = []
+            for title, script, commentary, step_variables in steps:
+                try:
+                    run_step(worker, title, script, commentary, out=log)
+                except SystemExit as exc:
+                    return log.getvalue(), "", exc
+                variables.extend(step_variables)
+            if not variables:
+                return log.getvalue(), "", None
+            state, exit_code = worker.run_command(f"typeset -p {' '.join(variables)}")
+            if exit_code != 0:
+                failure = transfer_failure(log, state, exit_code)
+                return log.getvalue(), "", failure
+            return log.getvalue(), state, None
+
+    local_steps, *worker_branches = branches
+    with ThreadPoolExecutor(max_workers=max(1, len(worker_branches))) as pool:
+        futures = [pool.submit(run_branch, steps) for steps in worker_branches]
+        for title, script, commentary, _ in local_steps:
+            run_step(shell, title, script, commentary)
+        for future in futures:
+            log, state, failure = future.result()
+            write_markdown(log)
+            if failure is not None:
+                raise failure
+            if not state:
+                continue
+            output, exit_code = shell.run_command(state)
+            if exit_code != 0:
+                log = io.StringIO()
+                failure = transfer_failure(log, output, exit_code)
+                write_markdown(log.getvalue())
+                raise failure
+
+
 def main() -> None:
     # Create persistent shell instance for efficient execution
     with PersistentShell(cwd=str(SCRIPT_DIR), env=ENV, debug=False) as shell:
-        script = """
-setopt nobanghist
-"""
         run_step(
             shell,
             "Set zsh options",
-            script,
+            SHELL_OPTIONS,
             "zsh is the default shell on macOS and many Linux systems. This ensures consistent behavior across shells."
         )
 
@@ -448,72 +738,70 @@ rm -rf {qp(DEMO_DIR)} && mkdir -p {qp(DEMO_DIR)}
             "Set up a clean directory for the demo artifacts. All we currently store here is the directory used to track the publisher's provenance mark generator."
         )
 
-        script = """
+        register_path(PROV_DIR / "generator.json")
+        register_path(PROV_DIR / "marks")
+        register_path(PROV_DIR / "marks/mark-0.json")
+        register_path(PROV_DIR / "marks/mark-1.json")
+
+        publisher_script = """
 PUBLISHER_PRVKEYS=$(envelope generate prvkeys)
 echo $PUBLISHER_PRVKEYS
 PUBLISHER_XID=$(envelope xid new "$PUBLISHER_PRVKEYS")
 echo $PUBLISHER_XID
 envelope format "$PUBLISHER_XID"
 """
-        run_step(
-            shell,
-            "Deriving publisher cryptographic material",
-            script,
-            commentary=
-                "Create the publisher's keypairs and XID document."
-        )
-
-        for name in PARTICIPANTS:
-            upper = name.upper()
-            script = f"""
-{upper}_PRVKEYS=$(envelope generate prvkeys)
-echo "{upper}_PRVKEYS=${upper}_PRVKEYS"
-{upper}_PUBKEYS=$(envelope generate pubkeys "${upper}_PRVKEYS")
-echo "{upper}_PUBKEYS=${upper}_PUBKEYS"
-{upper}_XID=$(envelope xid new "${upper}_PRVKEYS")
-echo "{upper}_XID=${upper}_XID"
-envelope format "${upper}_XID"
-"""
-            run_step(
-                shell,
-                f"Creating XID document for {upper}",
-                script,
-                commentary=f"Provision {upper.title()} with keys so we can address permits to real members."
-            )
-
-        script = build_content_script(
-            "CONTENT", "Welcome to the Gordian Club!", "Genesis Edition"
-        )
-        run_step(
-            shell,
-            "Assembling edition content envelope",
-            script,
-            commentary="Wrap the plaintext so its digest remains stable once we start sealing."
-        )
-
-        script = build_digest_script("CONTENT")
-        run_step(
-            shell,
-            "Capturing content digest",
-            script,
-            commentary="Store the content digest that must match the one stored in the Edition's provenance mark's info field."
-        )
-
-        register_path(PROV_DIR / "generator.json")
-        register_path(PROV_DIR / "marks")
-        register_path(PROV_DIR / "marks/mark-0.json")
-        register_path(PROV_DIR / "marks/mark-1.json")
-
-        script = f"""
+        genesis_script = f"""
 GENESIS_MARK=$(provenance new {rel(PROV_DIR)} --comment "Genesis edition" --format ur --quiet --info "$CONTENT_DIGEST")
 echo "$GENESIS_MARK"
 provenance print {rel(PROV_DIR)} --start 0 --end 0 --format markdown
 """
-        run_step(
+        # Key material for each party and the genesis content/mark have no
+        # dependencies on each other until the genesis edition is composed.
+        run_parallel_steps(
             shell,
-            "Starting provenance mark chain",
-            script,
-            commentary="Initialize the publisher's mark generator and bind the genesis mark to the content digest using the info field."
+            [
+                [
+                    (
+                        "Deriving publisher cryptographic material",
+                        publisher_script,
+                        "Create the publisher's keypairs and XID document.",
+                        ["PUBLISHER_PRVKEYS", "PUBLISHER_XID"],
+                    ),
+                ],
+                *(
+                    [
+                        (
+                            f"Creating XID document for {name.upper()}",
+                            build_participant_script(name),
+                            f"Provision {name.title()} with keys so we can address permits to real members.",
+                            participant_variables(name),
+                        ),
+                    ]
+                    for name in PARTICIPANTS
+                ),
+                [
+                    (
+                        "Assembling edition content envelope",
+                        build_content_script(
+                            "CONTENT", "Welcome to the Gordian Club!", "Genesis Edition"
+                        ),
+                        "Wrap the plaintext so its digest remains stable once we start sealing.",
+                        content_variables("CONTENT"),
+                    ),
+                    (
+                        "Capturing content digest",
+                        build_digest_script("CONTENT"),
+                        "Store the content digest that must match the one stored in the Edition's provenance mark's info field.",
+                        ["CONTENT_DIGEST"],
+                    ),
+                    (
+                        "Starting provenance mark chain",
+                        genesis_script,
+                        "Initialize the publisher's mark generator and bind the genesis mark to the content digest using the info field.",
+                        ["GENESIS_MARK"],
+                    ),
+                ],
+            ],
         )
 
         script = """
@@ -534,63 +822,35 @@ print -r -- "$EDITION_RAW"
             commentary="Seal the content, attach permits, and sign the first edition with the club keys."
         )
 
-        script = """
+        artifacts_script = """
 typeset -ga EDITION_URS=("${(@f)${EDITION_RAW%$'\\n'}}")
 EDITION_UR=${EDITION_URS[1]}
 typeset -ga SSKR_URS=("${EDITION_URS[@]:1}")
 for ur in "${EDITION_URS[@]}"; do print -r -- "$ur"; envelope format "$ur"; echo ""; done
 """
-        run_step(
-            shell,
-            "Capturing edition artifacts",
-            script,
-            commentary="Inspect the resulting edition and enumerate the emitted SSKR shares."
-        )
-
-        script = """
+        verify_script = """
 clubs edition verify \\
   --edition "$EDITION_UR" \\
   --publisher "$PUBLISHER_XID"
 """
-        run_step(shell, "Verifying composed edition", script, "No output indicates success.")
-
-        script = """
+        permits_script = """
 typeset -ga PERMIT_URS=("${(@f)$(clubs edition permits --edition "$EDITION_UR")%$'\\n'}")
 print -r -l -- "${PERMIT_URS[@]}"
 """
-        run_step(
-            shell,
-            "Extracting permit URs",
-            script,
-            commentary="List the sealed recipient messages to confirm the intended audience."
-        )
-
-        script = """
-typeset -g PERMIT_CONTENT_UR=""
-for permit in "${PERMIT_URS[@]}"; do
-  PERMIT_OUTPUT=$(clubs content decrypt \\
-    --edition "$EDITION_UR" \\
-    --publisher "$PUBLISHER_XID" \\
-    --permit "$permit" \\
-    --identity "$ALICE_PRVKEYS" \\
-    --emit-ur 2>/dev/null)
-  if [[ -n "$PERMIT_OUTPUT" ]]; then
-    PERMIT_CONTENT_UR=${PERMIT_OUTPUT%%$'\\n'*}
-    echo "$PERMIT_CONTENT_UR"
-    envelope format "$PERMIT_CONTENT_UR"
-    break
-  fi
-done
+        permit_decrypt_script = """
+PERMIT_ARGS=()
+for permit in "${PERMIT_URS[@]}"; do PERMIT_ARGS+=(--permit "$permit"); done
+PERMIT_CONTENT_UR=$(clubs content decrypt \\
+  --edition "$EDITION_UR" \\
+  --publisher "$PUBLISHER_XID" \\
+  "${PERMIT_ARGS[@]}" \\
+  --identity "$ALICE_PRVKEYS" \\
+  --emit-ur)
+PERMIT_CONTENT_UR=${PERMIT_CONTENT_UR%%$'\\n'*}
+echo "$PERMIT_CONTENT_UR"
+envelope format "$PERMIT_CONTENT_UR"
 """
-
-        run_step(
-            shell,
-            "Decrypting content with Alice's permit",
-            script,
-            "Try each permit against Alice's private keys until one works.",
-        )
-
-        script = """
+        sskr_decrypt_script = """
 SSKR_CONTENT_UR=$(clubs content decrypt \\
   --edition "$EDITION_UR" \\
   --publisher "$PUBLISHER_XID" \\
@@ -601,43 +861,68 @@ SSKR_CONTENT_UR=${SSKR_CONTENT_UR%%$'\\n'*}
 print -r -- "$SSKR_CONTENT_UR"
 envelope format "$SSKR_CONTENT_UR"
 """
-        run_step(
-            shell,
-            "Decrypting content via SSKR shares",
-            script,
-            commentary="Show that a quorum of shares can recover the same plaintext without any permit."
-        )
-
-        script = build_content_script(
-            "UPDATE",
-            "Club update: upcoming workshops and Q&A sessions",
-            "Second Edition"
-        )
-        run_step(
-            shell,
-            "Authoring follow-up content envelope",
-            script,
-            commentary="Prepare the content for the club's second edition."
-        )
-
-        script = build_digest_script("UPDATE")
-        run_step(
-            shell,
-            "Capturing follow-up content digest",
-            script,
-            commentary="Record the new digest so the next provenance mark can attest to the update."
-        )
-
-        script = f"""
+        second_mark_script = f"""
 SECOND_MARK=$(provenance next --comment "Second edition" --format ur --quiet --info "$UPDATE_DIGEST" {rel(PROV_DIR)})
 echo "$SECOND_MARK"
 provenance print {rel(PROV_DIR)} --start 1 --end 1 --format markdown
 """
-        run_step(
+        # Inspecting the genesis edition and preparing the follow-up content
+        # and mark only meet again when the second edition is composed.
+        run_parallel_steps(
             shell,
-            "Advancing provenance mark chain",
-            script,
-            commentary="Issue the second mark (#1) and confirm its info digest matches the updated content."
+            [
+                [
+                    (
+                        "Capturing edition artifacts",
+                        artifacts_script,
+                        "Inspect the resulting edition and enumerate the emitted SSKR shares.",
+                        [],
+                    ),
+                    ("Verifying composed edition", verify_script, "No output indicates success.", []),
+                    (
+                        "Extracting permit URs",
+                        permits_script,
+                        "List the sealed recipient messages to confirm the intended audience.",
+                        [],
+                    ),
+                    (
+                        "Decrypting content with Alice's permit",
+                        permit_decrypt_script,
+                        "Pass every permit to one decrypt call, which opens whichever permit Alice's private keys can unseal.",
+                        [],
+                    ),
+                    (
+                        "Decrypting content via SSKR shares",
+                        sskr_decrypt_script,
+                        "Show that a quorum of shares can recover the same plaintext without any permit.",
+                        [],
+                    ),
+                ],
+                [
+                    (
+                        "Authoring follow-up content envelope",
+                        build_content_script(
+                            "UPDATE",
+                            "Club update: upcoming workshops and Q&A sessions",
+                            "Second Edition"
+                        ),
+                        "Prepare the content for the club's second edition.",
+                        content_variables("UPDATE"),
+                    ),
+                    (
+                        "Capturing follow-up content digest",
+                        build_digest_script("UPDATE"),
+                        "Record the new digest so the next provenance mark can attest to the update.",
+                        ["UPDATE_DIGEST"],
+                    ),
+                    (
+                        "Advancing provenance mark chain",
+                        second_mark_script,
+                        "Issue the second mark (#1) and confirm its info digest matches the updated content.",
+                        ["SECOND_MARK"],
+                    ),
+                ],
+            ],
         )
 
         script = """
@@ -692,23 +977,36 @@ clubs edition sequence \\
 SCRIPT_DIR = Path(__file__).resolve().parent
 
 PATH_OBJECTS: set[Path] = set()
-PATH_REPLACEMENTS: list[tuple[str, str]] = []
+# Relative forms of the registered paths, which the steps format repeatedly.
+REL_CACHE: dict[Path, str] = {}
+# Any absolute path under SCRIPT_DIR collapses to its relative form; the
+# per-path entries only cover shell-quoted paths and paths outside it.
+PATH_REPLACEMENTS: dict[str, str] = {f"{SCRIPT_DIR}{os.sep}": ""}
+# Compiled form of PATH_REPLACEMENTS, rebuilt by sanitize_command on demand.
+_PATH_PATTERN: re.Pattern[str] | None = None
 
 def register_path(path: Path) -> Path:
     """Record *path* for later sanitization and return it unchanged."""
+    global _PATH_PATTERN
 
-    normalized = path if path.is_absolute() else (SCRIPT_DIR / path).resolve()
-    normalized = normalized.resolve()
+    # Registered paths are built from the already-resolved SCRIPT_DIR, so a
+    # lexical normalization is enough and avoids realpath's filesystem walk.
+    normalized = Path(os.path.normpath(SCRIPT_DIR / path))
     if normalized in PATH_OBJECTS:
         return normalized
 
     PATH_OBJECTS.add(normalized)
     abs_path = str(normalized)
-    rel_path = rel(normalized)
-    PATH_REPLACEMENTS.append((abs_path, rel_path))
-    PATH_REPLACEMENTS.append((shlex.quote(abs_path), rel_path))
-    PATH_REPLACEMENTS.append((f"@{abs_path}", f"@{rel_path}"))
-    PATH_REPLACEMENTS.append((f"@{shlex.quote(abs_path)}", f"@{rel_path}"))
+    rel_path = REL_CACHE[normalized] = rel(normalized)
+    quoted_path = shlex.quote(abs_path)
+    if quoted_path == abs_path:
+        # The SCRIPT_DIR prefix rule rewrites unquoted paths beneath it, and
+        # an unquoted path anywhere else is displayed as-is.
+        return normalized
+
+    PATH_REPLACEMENTS[quoted_path] = rel_path
+    PATH_REPLACEMENTS[f"@{quoted_path}"] = f"@{rel_path}"
+    _PATH_PATTERN = None
     return normalized
 
 DEMO_DIR = register_path(SCRIPT_DIR / "demo")
@@ -718,6 +1016,10 @@ PROV_DIR = register_path(DEMO_DIR / "provenance-chain")
 
 PARTICIPANTS = ["alice", "bob"]
 
+SHELL_OPTIONS = """
+setopt nobanghist
+"""
+
 ENV = os.environ.copy()
 
 if __name__ == "__main__":